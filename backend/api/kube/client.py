@@ -1,9 +1,23 @@
 from kubernetes import client, config
 
+# Conexiones simultáneas al API server (keep-alive por defecto en urllib3)
+POOL_MAXSIZE = 64
+
+_BATCH = None
+
+
 def get_batch_client():
-    try:
-        config.load_incluster_config()
-    except:
-        config.load_kube_config()
+    global _BATCH
+
+    if _BATCH is None:
+        try:
+            config.load_incluster_config()
+        except config.ConfigException:
+            config.load_kube_config()
+
+        cfg = client.Configuration.get_default_copy()
+        cfg.connection_pool_maxsize = POOL_MAXSIZE
+
+        _BATCH = client.BatchV1Api(api_client=client.ApiClient(configuration=cfg))
 
-    return client.BatchV1Api()
+    return _BATCH
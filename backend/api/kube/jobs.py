@@ -1,11 +1,10 @@
 import time
-from kubernetes import client
-from .client import get_batch_client
+from kubernetes import client, watch
 
 NAMESPACE = "mediacorr"
 
 
-def wait_until_job_deleted(batch, job_name, timeout=30):
+def _poll_until_job_deleted(batch, job_name, timeout=30):
     start = time.time()
 
     while True:
@@ -22,9 +21,36 @@ def wait_until_job_deleted(batch, job_name, timeout=30):
         time.sleep(1)
 
 
-def run_job(job_name: str, job_manifest):
-    batch = get_batch_client()
+def wait_until_job_deleted(batch, job_name, timeout=30):
+    field_selector = f"metadata.name={job_name}"
+
+    jobs = batch.list_namespaced_job(NAMESPACE, field_selector=field_selector)
+    if not jobs.items:
+        return  # ya no existe
+
+    w = watch.Watch()
+    try:
+        for event in w.stream(
+            batch.list_namespaced_job,
+            namespace=NAMESPACE,
+            field_selector=field_selector,
+            resource_version=jobs.metadata.resource_version,
+            timeout_seconds=timeout
+        ):
+            if event["type"] == "DELETED":
+                return
+    except client.exceptions.ApiException as e:
+        # resourceVersion demasiado antiguo: volver al sondeo
+        if e.status != 410:
+            raise
+        return _poll_until_job_deleted(batch, job_name, timeout)
+    finally:
+        w.stop()
+
+    raise RuntimeError(f"Timeout esperando eliminación del job {job_name}")
+
 
+def run_job(job_name: str, job_manifest, batch):
     try:
         batch.create_namespaced_job(
             namespace=NAMESPACE,
@@ -52,8 +78,7 @@ def run_job(job_name: str, job_manifest):
         return {"status": "restarted", "job": job_name}
 
 
-def job_status(job_name: str):
-    batch = get_batch_client()
+def job_status(job_name: str, batch):
     job = batch.read_namespaced_job(job_name, NAMESPACE)
 
     return {
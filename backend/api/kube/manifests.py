@@ -1,3 +1,4 @@
+from functools import lru_cache
 from kubernetes import client
 
 PVC_NAME = "mediacorr-pvc"
@@ -27,13 +28,37 @@ def base_job(
     command: list[str],
     parallelism: int = 1,
     env: dict | None = None,
+    gpus: int = 0,
 ):
-    env_vars = []
-    if env:
-        env_vars = [
-            client.V1EnvVar(name=k, value=str(v))
-            for k, v in env.items()
-        ]
+    env_items = tuple((k, str(v)) for k, v in env.items()) if env else ()
+    return _base_job_cached(name, image, tuple(command), parallelism, env_items, gpus)
+
+
+# Los V1Job se reutilizan entre requests: no mutarlos
+@lru_cache(maxsize=32)
+def _base_job_cached(
+    name: str,
+    image: str,
+    command: tuple[str, ...],
+    parallelism: int,
+    env_items: tuple[tuple[str, str], ...],
+    gpus: int,
+):
+    # K8s solo inyecta JOB_COMPLETION_INDEX: sin el total, cada pod
+    # asume JOB_COMPLETIONS=1 y procesa todo el trabajo
+    env_vars = [
+        client.V1EnvVar(name="JOB_COMPLETIONS", value=str(parallelism))
+    ]
+    env_vars += [
+        client.V1EnvVar(name=k, value=v)
+        for k, v in env_items
+    ]
+
+    resources = None
+    if gpus:
+        resources = client.V1ResourceRequirements(
+            limits={"nvidia.com/gpu": str(gpus)}
+        )
 
     return client.V1Job(
         metadata=client.V1ObjectMeta(name=name),
@@ -50,9 +75,10 @@ def base_job(
                             name=name,
                             image=image,
                             image_pull_policy="IfNotPresent",
-                            command=command,
+                            command=list(command),
                             env=env_vars,
                             volume_mounts=[data_volume_mount()],
+                            resources=resources,
                         )
                     ],
                     volumes=[data_volume()],
@@ -105,12 +131,36 @@ def filter_job(_parallelism):
     )
 
 
-def classifier_job(_parallelism):
+def pipeline_job(_parallelism, _from, _to, _records):
+    return base_job(
+        name="pipeline-job",
+        image="mediacorr-pipeline:latest",
+        command=["python", "-m", "app.pipeline"],
+        parallelism=int(_parallelism),
+        env={
+            "FROM_YEAR": _from,
+            "TO_YEAR": _to,
+            "MAX_RECORDS": _records
+        }
+    )
+
+
+def shard_files(files: list[str], parallelism: int):
+    return [files[i::parallelism] for i in range(parallelism)]
+
+
+def classifier_job(_parallelism, _gpu=False, _shard_dir=None):
+    env = None
+    if _shard_dir is not None:
+        env = {"FILES_SHARD_DIR": _shard_dir}
+
     return base_job(
         name="classifier-job",
         image="mediacorr-classifier:latest",
         command=["python", "-m", "app.classifier"],
-        parallelism=int(_parallelism)
+        parallelism=int(_parallelism),
+        env=env,
+        gpus=1 if _gpu else 0
     )
 
 
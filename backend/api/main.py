@@ -1,26 +1,47 @@
-from fastapi import FastAPI
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from api.kube.client import get_batch_client
 from api.kube.jobs import run_job, job_status
 from api.kube.manifests import (
+    shard_files,
     sources_job,
     ingestor_job,
     filter_job,
+    pipeline_job,
     classifier_job,
     correlator_job,
     icolcap_job
 )
 import os
+import json
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Un único ApiClient (pool urllib3 + TLS) compartido por todos los endpoints
+    app.state.batch = get_batch_client()
+    yield
+
 
 app = FastAPI(
     title="MediaCorr Controller API",
     description="API para orquestar el pipeline MediaCorr en Kubernetes",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 ANALYSIS_DIR = "/app/data/analysis"
+FILTERED_DIR = "/app/data/filtered"
+CLASSIFIER_SHARD_DIR = "/app/data/shards/classifier-job"
 os.makedirs(ANALYSIS_DIR, exist_ok=True)
 
+# Pool dedicado a las llamadas bloqueantes al API de Kubernetes
+KUBE_POOL = ThreadPoolExecutor(max_workers=32)
+
 app.mount(
     "/static",
     StaticFiles(directory=ANALYSIS_DIR),
@@ -28,38 +49,74 @@ app.mount(
 )
 
 
+async def in_kube_pool(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(KUBE_POOL, fn, *args)
+
+
+def get_batch(request: Request):
+    return request.app.state.batch
+
+
 # ---------- MARKET DATA ----------
 
 @app.post("/icolcap")
-def download_icolcap(_start="2024-01-01", _end="2025-01-01"):
-    return run_job("icolcap-job", icolcap_job(_start, _end))
+async def download_icolcap(_start="2024-01-01", _end="2025-01-01", batch=Depends(get_batch)):
+    return await in_kube_pool(run_job, "icolcap-job", icolcap_job(_start, _end), batch)
 
 
 # ---------- PIPELINE STAGES ----------
 
 @app.post("/download")
-def download_news(_parallelism=3, _from=2024, _to=2025, _records=50):
-    return run_job("sources-job", sources_job(_parallelism, _from, _to, _records))
+async def download_news(_parallelism=3, _from=2024, _to=2025, _records=50, batch=Depends(get_batch)):
+    return await in_kube_pool(run_job, "sources-job", sources_job(_parallelism, _from, _to, _records), batch)
 
 
 @app.post("/process")
-def process_news(_parallelism=3):
-    return run_job("ingestor-job", ingestor_job(_parallelism))
+async def process_news(_parallelism=3, batch=Depends(get_batch)):
+    return await in_kube_pool(run_job, "ingestor-job", ingestor_job(_parallelism), batch)
 
 
 @app.post("/filter")
-def filter_news(_parallelism=3):
-    return run_job("filter-job", filter_job(_parallelism))
+async def filter_news(_parallelism=3, batch=Depends(get_batch)):
+    return await in_kube_pool(run_job, "filter-job", filter_job(_parallelism), batch)
+
+
+@app.post("/pipeline")
+async def streaming_pipeline(_parallelism=3, _from=2024, _to=2025, _records=50, batch=Depends(get_batch)):
+    # download → process → filter en un solo job, sin data/parsed intermedio
+    return await in_kube_pool(run_job, "pipeline-job", pipeline_job(_parallelism, _from, _to, _records), batch)
+
+
+def write_classifier_shards(parallelism):
+    """
+    Un solo listdir en la API; cada pod lee solo su partición
+    desde el PVC (<índice>.json), no la lista completa por env.
+    """
+    if not os.path.isdir(FILTERED_DIR):
+        return None
+
+    files = sorted(f for f in os.listdir(FILTERED_DIR) if f.endswith(".parquet"))
+    os.makedirs(CLASSIFIER_SHARD_DIR, exist_ok=True)
+
+    for i, shard in enumerate(shard_files(files, parallelism)):
+        path = os.path.join(CLASSIFIER_SHARD_DIR, f"{i}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(shard, f)
+        os.replace(tmp_path, path)
+
+    return CLASSIFIER_SHARD_DIR
 
 
 @app.post("/sentiment")
-def sentiment_news(_parallelism=3):
-    return run_job("classifier-job", classifier_job(_parallelism))
+async def sentiment_news(_parallelism=3, _gpu: bool = False, batch=Depends(get_batch)):
+    shard_dir = await in_kube_pool(write_classifier_shards, int(_parallelism))
+    return await in_kube_pool(run_job, "classifier-job", classifier_job(_parallelism, _gpu, shard_dir), batch)
 
 
 @app.post("/analysis")
-def full_analysis(_parallelism=3):
-    return run_job("correlator-job", correlator_job(_parallelism))
+async def full_analysis(_parallelism=3, batch=Depends(get_batch)):
+    return await in_kube_pool(run_job, "correlator-job", correlator_job(_parallelism), batch)
 
 @app.get(
     "/analysis/sentiment-vs-market",
@@ -75,5 +132,5 @@ def get_sentiment_vs_market_plot():
 # ---------- STATUS ----------
 
 @app.get("/status/{job_name}")
-def get_status(job_name: str):
-    return job_status(job_name)
+async def get_status(job_name: str, batch=Depends(get_batch)):
+    return await in_kube_pool(job_status, job_name, batch)
@@ -1,19 +1,100 @@
 import os
-import json
+import orjson
+import pyarrow.parquet as pq
+from collections import namedtuple
 from typing import List, Dict
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from pysentimiento import create_analyzer
+
+import torch
+from pysentimiento.preprocessing import preprocess_tweet
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
 
 JOB_INDEX = int(os.environ.get("JOB_COMPLETION_INDEX", "0"))
 JOB_TOTAL = int(os.environ.get("JOB_COMPLETIONS", "1"))
 
-
-def split_work(items, index, total):
-    return [item for i, item in enumerate(items) if i % total == index]
+# Particiones precalculadas por la API en el PVC (<índice>.json por pod)
+FILES_SHARD_DIR = os.environ.get("FILES_SHARD_DIR")
 
 
-analyzer = create_analyzer(task="sentiment", lang="es")
+def split_work(items, index, total):
+    return items[index::total]
+
+
+def torch_threads():
+    # TORCH_THREADS fija el límite de CPU del pod; si no, los núcleos asignados
+    # al proceso (cpuset), no los del nodo
+    if os.environ.get("TORCH_THREADS"):
+        return max(1, int(os.environ["TORCH_THREADS"]))
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# ---------- MODEL ----------
+MODEL_NAME = "pysentimiento/robertuito-sentiment-analysis"
+MAX_LENGTH = 128
+
+Prediction = namedtuple("Prediction", ["output", "probas"])
+
+
+class SentimentAnalyzer:
+    """
+    Reemplazo de create_analyzer: FP16 en GPU, int8 dinámico en CPU.
+    Expone la misma interfaz .output / .probas que pysentimiento.
+    """
+
+    def __init__(self, model_name=MODEL_NAME):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        if torch.cuda.is_available():
+            self.device = "cuda"
+            model = AutoModelForSequenceClassification.from_pretrained(
+                model_name, torch_dtype=torch.float16
+            )
+        else:
+            self.device = "cpu"
+            torch.set_num_threads(torch_threads())
+            model = torch.quantization.quantize_dynamic(
+                AutoModelForSequenceClassification.from_pretrained(model_name),
+                {torch.nn.Linear},
+                dtype=torch.qint8
+            )
+
+        self.model = model.to(self.device).eval()
+        self.labels = [
+            self.model.config.id2label[i]
+            for i in range(self.model.config.num_labels)
+        ]
+
+    @torch.inference_mode()
+    def predict(self, texts: List[str]) -> List[Prediction]:
+        inputs = self.tokenizer(
+            [preprocess_tweet(t, lang="es") for t in texts],
+            padding=True,
+            truncation=True,
+            max_length=MAX_LENGTH,
+            return_tensors="pt"
+        ).to(self.device)
+
+        probs = torch.softmax(self.model(**inputs).logits.float(), dim=-1).cpu()
+
+        return [
+            Prediction(
+                output=self.labels[best],
+                probas=dict(zip(self.labels, row))
+            )
+            for best, row in zip(probs.argmax(dim=-1).tolist(), probs.tolist())
+        ]
+
+
+_analyzer = None
+
+
+def get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = SentimentAnalyzer()
+    return _analyzer
 
 
 def normalize_score(output):
@@ -21,54 +102,71 @@ def normalize_score(output):
     return round(p.get("POS", 0.0) - p.get("NEG", 0.0), 4)
 
 
-def classify_record(record: Dict) -> Dict:
-    text = f"{record.get('title','')} {record.get('body','')}".strip()
-    if len(text.split()) < 20:
-        record["sentiment_label"] = "neutral"
-        record["sentiment_score"] = 0.0
-        return record
+LABELS = {
+    "POS": "positive",
+    "NEG": "negative",
+    "NEU": "neutral"
+}
+
+BATCH_SIZE = 32
+MIN_WORDS = 20
 
-    result = analyzer.predict(text)
-    record["sentiment_label"] = {
-        "POS": "positive",
-        "NEG": "negative",
-        "NEU": "neutral"
-    }.get(result.output, "neutral")
-    record["sentiment_score"] = normalize_score(result)
-    return record
+
+def classify_records(records: List[Dict], batch_size=BATCH_SIZE) -> List[Dict]:
+    long_idx, long_texts = [], []
+
+    for i, record in enumerate(records):
+        text = f"{record.get('title','')} {record.get('body','')}".strip()
+        # maxsplit acota el trabajo: solo importa si hay al menos MIN_WORDS
+        if len(text.split(maxsplit=MIN_WORDS - 1)) < MIN_WORDS:
+            record["sentiment_label"] = "neutral"
+            record["sentiment_score"] = 0.0
+            continue
+        long_idx.append(i)
+        long_texts.append(text)
+
+    for b in range(0, len(long_texts), batch_size):
+        results = get_analyzer().predict(long_texts[b:b + batch_size])
+        for i, result in zip(long_idx[b:b + batch_size], results):
+            records[i]["sentiment_label"] = LABELS.get(result.output, "neutral")
+            records[i]["sentiment_score"] = normalize_score(result)
+
+    return records
 
 
 def analyze_many(
     input_dir="data/filtered",
-    output_dir="data/sentiment",
-    max_workers=4
+    output_dir="data/sentiment"
 ):
-    files = sorted(f for f in os.listdir(input_dir) if f.endswith(".json"))
-    files = split_work(files, JOB_INDEX, JOB_TOTAL)
+    if FILES_SHARD_DIR:
+        with open(os.path.join(FILES_SHARD_DIR, f"{JOB_INDEX}.json"), "rb") as f:
+            files = orjson.loads(f.read())
+    else:
+        with os.scandir(input_dir) as it:
+            files = sorted(
+                e.name for e in it
+                if e.is_file(follow_symlinks=False) and e.name.endswith(".parquet")
+            )
+        files = split_work(files, JOB_INDEX, JOB_TOTAL)
 
     print(f"[CLASSIFIER] Pod {JOB_INDEX+1}/{JOB_TOTAL} → {len(files)} archivos")
 
     os.makedirs(output_dir, exist_ok=True)
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {}
-        for fname in files:
-            futures[executor.submit(process_file, fname, input_dir, output_dir)] = fname
-
-        for f in as_completed(futures):
-            fname, count = f.result()
-            print(f"[OK] {fname} → {count} noticias")
+    for fname in files:
+        fname, count = process_file(fname, input_dir, output_dir)
+        print(f"[OK] {fname} → {count} noticias")
 
 
 def process_file(fname, input_dir, output_dir):
-    with open(os.path.join(input_dir, fname)) as f:
-        records = json.load(f)
+    records = pq.read_table(os.path.join(input_dir, fname)).to_pylist()
 
-    classified = [classify_record(r) for r in records]
+    classified = classify_records(records)
 
-    out = os.path.join(output_dir, f"sentiment_{fname}")
-    with open(out, "w") as f:
-        json.dump(classified, f, ensure_ascii=False, indent=2)
+    out = os.path.join(output_dir, f"sentiment_{os.path.splitext(fname)[0]}.json")
+    with open(out, "wb") as f:
+        # JSON compacto: solo lo consume el correlator
+        f.write(orjson.dumps(classified, option=orjson.OPT_NON_STR_KEYS))
 
     return fname, len(classified)
 
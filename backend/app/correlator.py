@@ -1,5 +1,7 @@
 import os
 import json
+import time
+import orjson
 import pandas as pd
 import numpy as np
 
@@ -16,63 +18,109 @@ JOB_TOTAL = int(os.environ.get("JOB_COMPLETIONS", "1"))
 
 
 def split_work(items, index, total):
-    return [item for i, item in enumerate(items) if i % total == index]
+    return items[index::total]
+
+
+# ---------- DAILY CACHE ----------
+DAILY_PARQUET = "daily.parquet"
+DAILY_COLUMNS = ["date", "avg_sentiment", "news_count", "negative_ratio"]
 
 
 # ---------- LOADERS ----------
 def load_sentiment_files(input_dir: str) -> pd.DataFrame:
     records = []
-    for fname in os.listdir(input_dir):
-        if fname.endswith(".json"):
-            with open(os.path.join(input_dir, fname), "r", encoding="utf-8") as f:
-                records.extend(json.load(f))
+    with os.scandir(input_dir) as it:
+        for entry in it:
+            if entry.is_file(follow_symlinks=False) and entry.name.endswith(".json"):
+                with open(entry.path, "rb") as f:
+                    records.extend(orjson.loads(f.read()))
 
     df = pd.DataFrame(records)
-    df["published_date"] = pd.to_datetime(df["published_date"], errors="coerce", utc=True)
+    df["published_date"] = pd.to_datetime(
+        df["published_date"], format="ISO8601", errors="coerce", utc=True
+    )
     df = df.dropna(subset=["published_date", "sentiment_score"])
-    df["date"] = df["published_date"].dt.date
+    df["date"] = df["published_date"].dt.floor("D")
     return df
 
 
 def aggregate_daily_sentiment(df: pd.DataFrame) -> pd.DataFrame:
     daily = (
-        df.groupby("date")
+        df.assign(is_negative=df["sentiment_label"] == "negative")
+        .groupby("date")
         .agg(
             avg_sentiment=("sentiment_score", "mean"),
             news_count=("sentiment_score", "count"),
-            negative_ratio=("sentiment_label", lambda x: (x == "negative").mean())
+            negative_ratio=("is_negative", "mean")
         )
         .reset_index()
     )
-    daily["date"] = pd.to_datetime(daily["date"], utc=True)
     return daily
 
 
-def load_icolcap(csv_path: str) -> pd.DataFrame:
-    df = pd.read_csv(csv_path)
+def is_daily_fresh(parquet_path: str, input_dir: str) -> bool:
+    if not os.path.exists(parquet_path):
+        return False
+
+    mtime = os.path.getmtime(parquet_path)
+    with os.scandir(input_dir) as it:
+        return all(
+            entry.stat().st_mtime <= mtime
+            for entry in it
+            if entry.name.endswith(".json")
+        )
+
+
+def load_daily_sentiment(input_dir: str, timeout=600) -> pd.DataFrame:
+    """
+    El pod 0 reduce los JSON de sentimiento a daily.parquet;
+    el resto de pods espera el archivo y lee solo esa tabla.
+    """
+    path = os.path.join(input_dir, DAILY_PARQUET)
+
+    if JOB_INDEX == 0:
+        if not is_daily_fresh(path, input_dir):
+            daily = aggregate_daily_sentiment(load_sentiment_files(input_dir))
+            tmp_path = f"{path}.tmp"
+            daily.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+            os.replace(tmp_path, path)
+    else:
+        start = time.time()
+        while not is_daily_fresh(path, input_dir):
+            if time.time() - start > timeout:
+                raise RuntimeError(f"Timeout esperando {path}")
+            time.sleep(2)
+
+    return pd.read_parquet(path, engine="pyarrow", columns=DAILY_COLUMNS)
+
+
+def load_icolcap(path: str) -> pd.DataFrame:
+    # Solo el cierre; la fecha viene como índice tz-aware del parquet
+    df = pd.read_parquet(path, columns=["Close"]).reset_index()
     df.columns = [c.lower().strip() for c in df.columns]
 
-    df["date"] = pd.to_datetime(df["date"], errors="coerce", utc=True).dt.normalize()
+    df["date"] = pd.to_datetime(
+        df["date"], format="ISO8601", errors="coerce", utc=True
+    ).dt.normalize()
     df = df.sort_values("date")
-    df["daily_return"] = np.log(df["close"]).diff()
+    df["daily_return"] = np.log1p(df["close"].pct_change())
     return df
 
 
 # ---------- MAIN ANALYSIS ----------
+def write_summary_part(report: dict, output_dir: str):
+    with open(os.path.join(output_dir, f"summary_part_{JOB_INDEX}.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+
 def run_full_analysis(
     sentiment_dir="data/sentiment",
-    icolcap_csv="data/market/icolcap.csv",
+    icolcap_path="data/market/icolcap.parquet",
     output_dir="data/analysis",
     max_lags=None
 ):
     os.makedirs(output_dir, exist_ok=True)
 
-    sentiment = load_sentiment_files(sentiment_dir)
-    daily = aggregate_daily_sentiment(sentiment)
-    market = load_icolcap(icolcap_csv)
-
-    df = daily.merge(market, on="date", how="inner").dropna()
-
     # Experimentos posibles
     all_lags = max_lags or list(range(1, 11))
     my_lags = split_work(all_lags, JOB_INDEX, JOB_TOTAL)
@@ -81,13 +129,41 @@ def run_full_analysis(
 
     report = {}
 
+    # Sin lags asignados la parte se escribe igual (vacía): el reducer espera N partes.
+    # Se sale antes de cargar datos para no esperar el daily.parquet del pod 0
+    if not my_lags:
+        write_summary_part(report, output_dir)
+        return report
+
+    daily = load_daily_sentiment(sentiment_dir)
+    market = load_icolcap(icolcap_path)
+
+    # Join por índice ordenado (DatetimeIndex UTC en ambos lados)
+    daily = daily.set_index("date").sort_index()
+    market = market.set_index("date").sort_index()
+    df = daily.join(market, how="inner").dropna().reset_index()
+
+    # Una sola pasada hasta el mayor lag; cada lag es un corte de estas tablas.
+    # El pod 0 llega hasta el mayor lag global: escribe la tabla completa.
+    all_corr = lagged_correlation(
+        df,
+        sentiment_col="avg_sentiment",
+        target_col="daily_return",
+        max_lag=max(all_lags) if JOB_INDEX == 0 else max(my_lags)
+    )
+
+    all_granger = granger_test(
+        df,
+        sentiment_col="avg_sentiment",
+        target_col="daily_return",
+        max_lag=max(my_lags)
+    )
+
+    if JOB_INDEX == 0:
+        all_corr.to_csv(os.path.join(output_dir, "lagged_correlation.csv"), index=False)
+
     for lag in my_lags:
-        lag_corr = lagged_correlation(
-            df,
-            sentiment_col="avg_sentiment",
-            target_col="daily_return",
-            max_lag=lag
-        )
+        lag_corr = all_corr[all_corr["lag"] <= lag]
 
         lag_name = f"lagged_correlation_lag_{lag}"
         lag_corr.to_csv(os.path.join(output_dir, f"{lag_name}.csv"), index=False)
@@ -100,12 +176,7 @@ def run_full_analysis(
 
         report[lag_name] = lag_corr.to_dict(orient="records")
 
-        granger = granger_test(
-            df,
-            sentiment_col="avg_sentiment",
-            target_col="daily_return",
-            max_lag=lag
-        )
+        granger = all_granger[all_granger["lag"] <= lag]
 
         granger.to_csv(
             os.path.join(output_dir, f"granger_lag_{lag}.csv"),
@@ -132,8 +203,7 @@ def run_full_analysis(
             output_path=os.path.join(output_dir, "rolling_correlation.png")
         )
 
-    with open(os.path.join(output_dir, f"summary_part_{JOB_INDEX}.json"), "w") as f:
-        json.dump(report, f, indent=2)
+    write_summary_part(report, output_dir)
 
     return report
 
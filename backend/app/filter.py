@@ -1,33 +1,142 @@
 import os
-import json
+import orjson
 from app.config.keywords import KEYWORDS
-from concurrent.futures import ThreadPoolExecutor, as_completed  
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+import ahocorasick
 import unicodedata
 import re
+import hashlib
+import pickle
+import tempfile
+from importlib.metadata import version, PackageNotFoundError
+from functools import lru_cache
+from itertools import islice
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 JOB_INDEX = int(os.environ.get("JOB_COMPLETION_INDEX", "0"))
 JOB_TOTAL = int(os.environ.get("JOB_COMPLETIONS", "1"))
 
+_TOKEN_RE = re.compile(r"\b[a-záéíóúñ]+\b")
+
+# Caché privada de cada pod: el archivo se deserializa con pickle, así que
+# no va en /tmp ni en el PVC compartido donde escriben todos los pods
+AUTOMATON_CACHE_DIR = os.environ.get(
+    "AUTOMATON_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "mediacorr", "automaton")
+)
+
+# Subir al cambiar normalize_text, _ACCENT_MAP, tokenize o el valor guardado
+AUTOMATON_VERSION = 1
+
+try:
+    _AHOCORASICK_VERSION = version("pyahocorasick")
+except PackageNotFoundError:
+    _AHOCORASICK_VERSION = "unknown"
+
+# Salida columnar para el classifier
+FILTERED_SCHEMA = pa.schema([
+    ("title", pa.string()),
+    ("body", pa.string()),
+    ("published_date", pa.string()),
+    ("_filter_score", pa.int32()),
+])
+ROW_GROUP_SIZE = 1024
+
+
 def split_work(items, index, total):
-    return [item for i, item in enumerate(items) if i % total == index]
+    return items[index::total]
+
+
+# Acentos del español: cubre casi todo el texto sin pasar por NFKD
+_ACCENT_MAP = str.maketrans("áéíóúüñàèìòù", "aeiouunaeiou")
 
 
 def normalize_text(text: str) -> str:
-    text = text.lower()
+    text = text.lower().translate(_ACCENT_MAP)
+    if text.isascii():
+        return text
+
+    # Caracteres exóticos: descomposición Unicode completa
     text = unicodedata.normalize("NFKD", text)
     text = "".join(c for c in text if not unicodedata.combining(c))
     return text
 
 
 def tokenize(text: str) -> set:
-    return set(re.findall(r"\b[a-záéíóúñ]+\b", text))
-
-
-def filter_news(parsed_records, keywords=KEYWORDS, min_words=20):
-    filtered = []
-
-    norm_keywords = [normalize_text(k) for k in keywords]
+    return set(_TOKEN_RE.findall(text))
+
+
+def automaton_path(keywords):
+    # La clave incluye la versión del formato y de pyahocorasick:
+    # un automata de otra versión nunca se reutiliza
+    key = "\n".join([f"v{AUTOMATON_VERSION}", _AHOCORASICK_VERSION, *keywords])
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(AUTOMATON_CACHE_DIR, f"kw_{digest}.aho")
+
+
+@lru_cache(maxsize=8)
+def build_automaton(keywords=tuple(KEYWORDS)):
+    """
+    Automata Aho-Corasick sobre los tokens de cada keyword.
+    Cada stem guarda (stem, ids de keywords que lo contienen).
+    Se persiste en disco por hash de versión + keywords: los workers solo lo cargan.
+    """
+    path = automaton_path(keywords)
+    try:
+        return ahocorasick.load(path, pickle.loads)
+    except (OSError, ValueError, pickle.UnpicklingError):
+        pass
+
+    automaton = ahocorasick.Automaton()
+
+    for kw_id, kw in enumerate(keywords):
+        for stem in tokenize(normalize_text(kw)):
+            _, ids = automaton.get(stem, (stem, set()))
+            ids.add(kw_id)
+            automaton.add_word(stem, (stem, ids))
+
+    automaton.make_automaton()
+
+    # Escritura atómica: varios workers pueden construirlo a la vez
+    tmp_path = None
+    try:
+        os.makedirs(AUTOMATON_CACHE_DIR, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=AUTOMATON_CACHE_DIR, suffix=".tmp")
+        os.close(fd)
+        automaton.save(tmp_path, pickle.dumps)
+        os.replace(tmp_path, path)
+    except OSError:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return automaton
+
+
+def match_keywords(automaton, tokens, max_len) -> set:
+    """
+    max_len: longitud del stem más largo; basta recorrer ese prefijo del token.
+    """
+    matched = set()
+
+    for t in tokens:
+        # El token empieza con un stem de keyword
+        for end, (stem, ids) in automaton.iter(t, 0, max_len):
+            if end + 1 == len(stem):
+                matched |= ids
+
+        # Un stem de keyword empieza con el token
+        for _, (_, ids) in automaton.items(t):
+            matched |= ids
+
+    return matched
+
+
+def iter_filtered(parsed_records, keywords=KEYWORDS, min_words=20, automaton=None):
+    if automaton is None:
+        automaton = build_automaton(tuple(keywords))
+    max_len = automaton.get_stats()["longest_word"]
 
     for record in parsed_records:
         title = record.get("title") or ""
@@ -36,50 +145,85 @@ def filter_news(parsed_records, keywords=KEYWORDS, min_words=20):
         if not body:
             continue
 
-        if len(body.split()) < min_words:
+        # maxsplit acota la lista: solo importa si hay al menos min_words
+        if len(body.split(maxsplit=min_words - 1)) < min_words:
             continue
 
         text = f"{title} {body}"
         norm_text = normalize_text(text)
         tokens = tokenize(norm_text)
 
-        match_score = 0
-
-        for kw in norm_keywords:
-            kw_tokens = tokenize(kw)
-
-            # Coincidencia parcial (morfología básica)
-            if any(t.startswith(k) or k.startswith(t) for t in tokens for k in kw_tokens):
-                match_score += 1
+        # Coincidencia parcial (morfología básica)
+        match_score = len(match_keywords(automaton, tokens, max_len))
 
         # Umbral flexible
         if match_score >= 1:
             record["_filter_score"] = match_score
-            filtered.append(record)
+            yield record
+
+
+def filter_news(parsed_records, keywords=KEYWORDS, min_words=20, automaton=None):
+    filtered = list(iter_filtered(parsed_records, keywords, min_words, automaton))
 
     print(f"[INFO] Filtradas {len(filtered)} noticias de {len(parsed_records)}")
     return filtered
 
+
+def read_jsonl(f, counter):
+    for line in f:
+        if line.strip():
+            counter[0] += 1
+            yield orjson.loads(line)
+
+
+def write_parquet(records, output_file, row_group_size=ROW_GROUP_SIZE):
+    """
+    Escribe los registros en Parquet por row groups a medida que llegan.
+    El archivo solo se crea si hay al menos un registro.
+    """
+    records = iter(records)
+    count = 0
+    writer = None
+
+    try:
+        while batch := list(islice(records, row_group_size)):
+            if writer is None:
+                os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+                writer = pq.ParquetWriter(output_file, FILTERED_SCHEMA, compression="zstd")
+            writer.write_table(pa.Table.from_pylist(batch, schema=FILTERED_SCHEMA))
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return count
+
+
 def filter_from_files(fname, input_dir="data/parsed", output_dir="data/filtered", keywords=KEYWORDS):
+    """
+    Lee el JSONL del ingestor registro a registro y escribe las coincidencias
+    a medida que aparecen (Parquet), sin cargar el archivo completo.
+    """
     path = os.path.join(input_dir, fname)
-    with open(path, "r", encoding="utf-8") as f:
-        parsed_records = json.load(f)
+    output_file = os.path.join(output_dir, f"filtered_{os.path.splitext(fname)[0]}.parquet")
+
+    read = [0]
+
+    with open(path, "rb") as f:
+        count = write_parquet(iter_filtered(read_jsonl(f, read), keywords), output_file)
 
-    filtered = filter_news(parsed_records, keywords)
+    print(f"[INFO] Filtradas {count} noticias de {read[0]}")
+    return fname, count
 
-    if filtered:
-        os.makedirs(output_dir, exist_ok=True)
-        output_file = os.path.join(output_dir, f"filtered_{fname}")
-        with open (output_file, "w", encoding="utf-8") as f:
-            json.dump(filtered, f, ensure_ascii=False, indent=2)
-        return fname, len(filtered)
-    else:
-        return fname, 0
 
-def filter_many(input_dir="data/parsed", output_dir="data/filtered", max_workers=5):
+def filter_many(input_dir="data/parsed", output_dir="data/filtered", max_workers=os.cpu_count(), keywords=KEYWORDS):
     os.makedirs(output_dir, exist_ok=True)
 
-    files = sorted([f for f in os.listdir(input_dir) if f.endswith(".json")])
+    with os.scandir(input_dir) as it:
+        files = sorted(
+            e.name for e in it
+            if e.is_file(follow_symlinks=False) and e.name.endswith(".jsonl")
+        )
 
     index = int(os.getenv("JOB_COMPLETION_INDEX", "0"))
     total = int(os.getenv("JOB_COMPLETIONS", "1"))
@@ -88,9 +232,15 @@ def filter_many(input_dir="data/parsed", output_dir="data/filtered", max_workers
 
     print(f"[FILTER] Pod {index}/{total} procesará {len(my_files)} archivos")
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    # filter_news es CPU puro (GIL): un proceso por núcleo.
+    # Cada worker compila el automata una sola vez al arrancar.
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=build_automaton,
+        initargs=(tuple(keywords),)
+    ) as executor:
         futures = {
-            executor.submit(filter_from_files, fname): fname
+            executor.submit(filter_from_files, fname, input_dir, output_dir, keywords): fname
             for fname in my_files
         }
 
@@ -111,7 +261,7 @@ if __name__ == "__main__":
     filter_many(
         input_dir="data/parsed",
         output_dir="data/filtered",
-        max_workers=5
+        max_workers=os.cpu_count()
     )
 
     print("[FILTER] Filtering completed")
@@ -1,34 +1,61 @@
 import os
+import time
+import shutil
 import yfinance as yf
 
 START = str(os.environ.get("START", "2024-01-01"))
 END = str(os.environ.get("END", "2025-01-01"))
 
+# Un rango ya descargado se reutiliza durante un día
+CACHE_TTL = 86400
 
-def download_icolcap_csv(_start=START, _end=END):
+
+def is_cache_fresh(path, ttl=CACHE_TTL):
+    try:
+        return os.path.getmtime(path) > time.time() - ttl
+    except OSError:
+        return False
+
+
+def download_icolcap(_start=START, _end=END):
     output_dir = "data/market"
-    output_file = "icolcap.csv"
+    output_file = "icolcap.parquet"
     output_path = os.path.join(output_dir, output_file)
+    cache_path = os.path.join(output_dir, f"icolcap_{_start}_{_end}.parquet")
 
     os.makedirs(output_dir, exist_ok=True)
 
-    ticker = yf.Ticker("ICOLCAP.CL")
-    df = ticker.history(
-        start=_start,
-        end=_end,
-        interval="1d"
-    )
-
-    df.to_csv(output_path)
+    if is_cache_fresh(cache_path):
+        print(f"Usando caché: {cache_path}")
+    else:
+        ticker = yf.Ticker("ICOLCAP.CL")
+        df = ticker.history(
+            start=_start,
+            end=_end,
+            interval="1d",
+            actions=False
+        )
+
+        # yfinance devuelve un DataFrame vacío si la descarga falla:
+        # no se cachea, así la próxima ejecución vuelve a intentarlo
+        if df.empty or "Close" not in df:
+            raise RuntimeError(f"Descarga vacía de ICOLCAP.CL ({_start} → {_end})")
+
+        # Escritura atómica: un archivo a medias nunca queda como caché válida
+        tmp_path = cache_path + ".tmp"
+        df.to_parquet(tmp_path, compression="zstd")
+        os.replace(tmp_path, cache_path)
+
+    shutil.copyfile(cache_path, output_path)
 
     print(f"Archivo guardado en: {output_path}")
 
 if __name__ == "__main__":
     print("[ICOLCAP] Downloading ICOLCAP data")
 
-    download_icolcap_csv(
-        _start="2024-01-01",
-        _end="2025-01-01",
+    download_icolcap(
+        _start=START,
+        _end=END,
     )
 
     print("[ICOLCAP] ICOLCAP data saved")
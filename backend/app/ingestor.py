@@ -1,13 +1,12 @@
 import os
 import re
-import json
-import gzip
-import time
-from bs4 import BeautifulSoup
+import orjson
+from datetime import datetime
+from selectolax.lexbor import LexborHTMLParser
 from readability import Document
 from dateutil import parser as date_parser
-from warcio.archiveiterator import ArchiveIterator
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from fastwarc.warc import ArchiveIterator, WarcRecordType
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # ------------------ K8s PARALLELISM ------------------
 
@@ -15,40 +14,70 @@ JOB_INDEX = int(os.environ.get("JOB_COMPLETION_INDEX", "0"))
 JOB_TOTAL = int(os.environ.get("JOB_COMPLETIONS", "1"))
 
 
+# Progreso cada N elementos: print por registro serializa los workers
+PROGRESS_EVERY = 100
+
+_SPANISH_DATE_RE = re.compile(r"\b(\d{1,2}\s+de\s+[a-zA-Z]+\s+de\s+\d{4})\b")
+
+
 def split_work(items, index, total):
-    return [item for i, item in enumerate(items) if i % total == index] 
+    return items[index::total]
+
+
+def _fast_parse(value, fuzzy=False):
+    # Casi todas las fechas meta son ISO-8601: fromisoformat es C puro
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).isoformat()
+    except (ValueError, TypeError, AttributeError):
+        pass
+    try:
+        return date_parser.parse(value, fuzzy=fuzzy).isoformat()
+    except Exception:
+        return None
 
 
 def extract_html(warc_path):
     extracted = []
 
-    with gzip.open(warc_path, "rb") as stream:
-        for record in ArchiveIterator(stream):
-            if record.rec_type != "response":
-                continue
+    # fastwarc detecta la compresión y filtra el tipo de registro en C
+    for record in ArchiveIterator(warc_path, record_types=WarcRecordType.response):
+        http_headers = record.http_headers
+        if not http_headers:
+            continue
 
-            http_headers = record.http_headers
-            if not http_headers:
-                continue
+        # Redirecciones y páginas de error no son artículos: ni se leen
+        if not 200 <= http_headers.status_code < 300:
+            continue
 
-            content_type = http_headers.get_header("Content-Type")
-            if not content_type or "text/html" not in content_type:
-                continue
+        content_type = http_headers.get("Content-Type")
+        if not content_type or "text/html" not in content_type:
+            continue
 
-            try:
-                payload = record.content_stream().read()
-                html = payload.decode("utf-8", errors="replace")
-            except Exception:
-                continue
+        try:
+            payload = record.reader.read()
+        except Exception:
+            continue
 
-            extracted.append({
-                "url": record.rec_headers.get_header("WARC-Target-URI"),
-                "timestamp": record.rec_headers.get_header("WARC-Date"),
-                "html": html
-            })
+        if not payload:
+            continue
+
+        html = payload.decode("utf-8", errors="replace")
+
+        extracted.append({
+            "url": record.headers.get("WARC-Target-URI"),
+            "timestamp": record.headers.get("WARC-Date"),
+            "html": html
+        })
 
     return extracted
 
+
+def is_article_div(div):
+    # <div class> sin valor llega como None
+    cls = div.attributes.get("class") or ""
+    return "article" in cls or "content" in cls
+
+
 def parse_html(html: str, fallback_date=None):
     if not html or not isinstance(html, str):
         return {"title": None, "body": None, "published_date": fallback_date}
@@ -59,21 +88,29 @@ def parse_html(html: str, fallback_date=None):
     except Exception:
         cleaned_html = html
 
-    soup = BeautifulSoup(cleaned_html, "lxml")
+    tree = LexborHTMLParser(cleaned_html)
 
     # Preferir contenedores de artículo si existen
-    article = soup.find("article") or soup.find("div", class_=lambda c: c and ("article" in c or "content" in c))
-    root = article or soup
+    article = tree.css_first("article") or next(
+        (
+            div for div in tree.css("div[class]")
+            if is_article_div(div)
+        ),
+        None
+    )
+    root = article or tree
 
     title = None
-    if root.find("h1"):
-        title = root.find("h1").get_text(strip=True)
-    elif soup.title:
-        title = soup.title.get_text(strip=True)
+    h1 = root.css_first("h1")
+    title_tag = tree.css_first("title")
+    if h1:
+        title = h1.text(strip=True)
+    elif title_tag:
+        title = title_tag.text(strip=True)
 
     paragraphs = []
-    for p in root.find_all("p"):
-        text = p.get_text(strip=True)
+    for p in root.css("p"):
+        text = p.text(strip=True)
         if len(text) >= 60 and not text.isupper():
             paragraphs.append(text)
 
@@ -85,117 +122,70 @@ def parse_html(html: str, fallback_date=None):
 
     # fecha
     published_date = None
-    meta_keys = [
-        {"property": "article:published_time"},
-        {"name": "pubdate"},
-        {"name": "publish-date"},
-        {"name": "date"},
-        {"itemprop": "datePublished"},
+    meta_selectors = [
+        'meta[property="article:published_time"]',
+        'meta[name="pubdate"]',
+        'meta[name="publish-date"]',
+        'meta[name="date"]',
+        'meta[itemprop="datePublished"]',
     ]
-    for attrs in meta_keys:
-        tag = soup.find("meta", attrs=attrs)
-        if tag and tag.get("content"):
-            try:
-                published_date = date_parser.parse(tag["content"]).isoformat()
+    for selector in meta_selectors:
+        tag = tree.css_first(selector)
+        if tag and tag.attributes.get("content"):
+            published_date = _fast_parse(tag.attributes["content"])
+            if published_date:
                 break
-            except Exception:
-                pass
 
     if not published_date:
-        time_tag = soup.find("time")
+        time_tag = tree.css_first("time")
         if time_tag:
-            candidate = time_tag.get("datetime") or time_tag.get_text(strip=True)
-            try:
-                published_date = date_parser.parse(candidate).isoformat()
-            except Exception:
-                pass
+            candidate = time_tag.attributes.get("datetime") or time_tag.text(strip=True)
+            published_date = _fast_parse(candidate)
 
     if not published_date:
-        text = soup.get_text(" ")
-        match = re.search(r"\b(\d{1,2}\s+de\s+[a-zA-Z]+\s+de\s+\d{4})\b", text)
+        text = tree.text(separator=" ")
+        match = _SPANISH_DATE_RE.search(text)
         if match:
-            try:
-                published_date = date_parser.parse(match.group(1), fuzzy=True).isoformat()
-            except Exception:
-                pass
+            published_date = _fast_parse(match.group(1), fuzzy=True)
 
     if not published_date:
         published_date = fallback_date
 
     return {"title": title, "body": body, "published_date": published_date}
 
-def extract_html_many(warc_dir, max_workers=5):
-    results = []
-
-    warc_paths = [ 
-        os.path.join(warc_dir, fname)
-        for fname in os.listdir(warc_dir) 
-        if fname.lower().endswith(".warc") or fname.lower().endswith(".warc.gz") 
-    ]
-
-    total = len(warc_paths)
-    print(f"[INFO] Se encontraron {total} archivos WARC en {warc_dir}")
 
-    start_time = time.time()
+def parse_warc_file(warc_path, output_file):
+    """
+    extract + parse + escritura de un WARC completo dentro de un worker:
+    los registros parseados no vuelven al proceso principal.
+    """
+    count = 0
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {
-            executor.submit(extract_html, path): path
-            for path in warc_paths
-        }
+    extracted = extract_html(warc_path)
 
-        processed = 0
-        for future in as_completed(futures):
-            warc_path = futures[future]
+    # JSONL: el filter lo consume registro a registro
+    with open(output_file, "wb") as f:
+        for r in extracted:
             try:
-                extracted = future.result()
-                results.extend(extracted)
-            except Exception as e:
-                print(f"[WARN] Error procesando {warc_path}: {e}")
-            finally:
-                processed += 1
-                print(f"[PROGRESO] {processed}/{total} archivos procesados")
-
-    elapsed = time.time() - start_time
-    print(f"[INFO] extract_html_many completado en {elapsed:.2f} segundos")
-
-    return results
-
-
-def parse_html_many(html_records, max_workers=5):
-    parsed = []
-
-    total = len(html_records)
-    print(f"[INFO] Se recibieron {total} registros HTML para parsear")
-
-    start_time = time.time()
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(parse_html, r["html"], r.get("timestamp")) for r in html_records]
-
-        processed = 0
-        for future in as_completed(futures):
-            try:
-                parsed.append(future.result())
+                record = parse_html(r["html"], r.get("timestamp"))
             except Exception as e:
                 print(f"[WARN] Error parseando HTML: {e}")
-            finally:
-                processed += 1
-                print(f"[PROGRESO] {processed}/{total} registros parseados")
+                continue
+            f.write(orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS))
+            f.write(b"\n")
+            count += 1
 
-    elapsed = time.time() - start_time
-    print(f"[INFO] parse_html_many completado en {elapsed:.2f} segundos")
+    return output_file, count
 
-    return parsed
 
-def process_and_save(warc_dir, output_dir="data/parsed", max_workers=5):
+def process_and_save(warc_dir, output_dir="data/parsed", max_workers=os.cpu_count()):
     os.makedirs(output_dir, exist_ok=True)
 
-    warc_paths = sorted([
-        os.path.join(warc_dir, fname)
-        for fname in os.listdir(warc_dir)
-        if fname.lower().endswith((".warc", ".warc.gz"))
-    ])
+    with os.scandir(warc_dir) as it:
+        warc_paths = sorted(
+            e.path for e in it
+            if e.name.lower().endswith((".warc", ".warc.gz")) and e.is_file()
+        )
 
     index = int(os.getenv("JOB_COMPLETION_INDEX", "0"))
     total = int(os.getenv("JOB_COMPLETIONS", "1"))
@@ -204,22 +194,27 @@ def process_and_save(warc_dir, output_dir="data/parsed", max_workers=5):
 
     print(f"[INGESTOR] Pod {index}/{total} procesará {len(my_warcs)} archivos")
 
-    for i, warc_path in enumerate(my_warcs, 1):
-        print(f"[INFO] Procesando {i}/{len(my_warcs)}: {warc_path}")
-
-        extracted = extract_html(warc_path)
-        parsed = parse_html_many(extracted, max_workers=max_workers)
-
-        output_file = os.path.join(
-            output_dir,
-            f"news_{index}_{i}.json"
-        )
+    # Un WARC por tarea: los rangos de CommonCrawl traen un solo registro,
+    # así que el paralelismo útil está entre archivos
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                parse_warc_file,
+                warc_path,
+                os.path.join(output_dir, f"news_{index}_{i}.jsonl")
+            ): warc_path
+            for i, warc_path in enumerate(my_warcs, 1)
+        }
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(parsed, f, ensure_ascii=False, indent=2)
+        for i, future in enumerate(as_completed(futures), 1):
+            warc_path = futures[future]
+            try:
+                output_file, count = future.result()
+                if i % PROGRESS_EVERY == 0 or i == len(my_warcs):
+                    print(f"[INFO] {i}/{len(my_warcs)} Guardado {output_file} ({count} registros)")
+            except Exception as e:
+                print(f"[WARN] Error procesando {warc_path}: {e}")
 
-        print(f"[INFO] Guardado {output_file}")
-        
 
 if __name__ == "__main__":
     print("[INGESTOR] Starting ingestion process")
@@ -227,7 +222,7 @@ if __name__ == "__main__":
     process_and_save(
         warc_dir="data/raw",
         output_dir="data/parsed",
-        max_workers=5
+        max_workers=os.cpu_count()
     )
 
     print("[INGESTOR] Ingestion completed")
@@ -0,0 +1,135 @@
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+from app.config.colombian_domains import COLOMBIAN_DOMAINS
+from app.config.keywords import KEYWORDS
+from app.sources import collect_records, download_cc_file
+from app.ingestor import extract_html, parse_html
+from app.filter import build_automaton, iter_filtered, write_parquet
+
+# ------------------ K8s PARALLELISM ------------------
+
+JOB_INDEX = int(os.environ.get("JOB_COMPLETION_INDEX", "0"))
+JOB_TOTAL = int(os.environ.get("JOB_COMPLETIONS", "1"))
+
+FROM_YEAR = int(os.environ.get("FROM_YEAR", 2024))
+TO_YEAR = int(os.environ.get("TO_YEAR", 2025))
+MAX_RECORDS = int(os.environ.get("MAX_RECORDS", 50))
+
+
+def split_work(items, index, total):
+    return items[index::total]
+
+
+def parse_and_filter(html, fallback_date=None, keywords=KEYWORDS):
+    """
+    Parseo + filtro en el mismo proceso: el registro parseado no vuelve
+    al proceso principal si no pasa el filtro.
+    """
+    parsed = parse_html(html, fallback_date)
+    for record in iter_filtered([parsed], keywords):
+        return record
+    return None
+
+
+def iter_pipeline(
+    records,
+    download_workers=5,
+    extract_workers=5,
+    parse_workers=os.cpu_count(),
+    keywords=KEYWORDS,
+):
+    """
+    download → extract → parse/filter solapados: cada WARC pasa a la
+    siguiente etapa apenas termina la anterior, sin escribir data/parsed.
+    Devuelve las noticias filtradas a medida que se producen.
+    """
+    # Los callbacks solo encolan; el hilo principal despacha la siguiente etapa
+    done_q = queue.Queue()
+    pending = 0
+
+    # Tope de tareas en vuelo: si el parseo se atrasa, no se descarga más
+    # y el HTML pendiente en memoria queda acotado
+    records = iter(records)
+    max_in_flight = 4 * parse_workers
+
+    with ThreadPoolExecutor(max_workers=download_workers) as download_pool, \
+            ThreadPoolExecutor(max_workers=extract_workers) as extract_pool, \
+            ProcessPoolExecutor(
+                max_workers=parse_workers,
+                initializer=build_automaton,
+                initargs=(tuple(keywords),)
+            ) as parse_pool:
+
+        def submit(pool, stage, fn, *args):
+            nonlocal pending
+            pending += 1
+            future = pool.submit(fn, *args)
+            future.add_done_callback(lambda f: done_q.put((stage, f)))
+
+        while True:
+            for record in islice(records, max(0, max_in_flight - pending)):
+                submit(download_pool, "download", download_cc_file, record)
+
+            if not pending:
+                break
+
+            stage, future = done_q.get()
+            pending -= 1
+
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[WARN] Error en etapa {stage}: {e}")
+                continue
+
+            if stage == "download":
+                submit(extract_pool, "extract", extract_html, result)
+            elif stage == "extract":
+                for r in result:
+                    submit(parse_pool, "parse", parse_and_filter, r["html"], r.get("timestamp"), keywords)
+            elif result is not None:
+                yield result
+
+
+def run_pipeline(records, output_dir="data/filtered", **kwargs):
+    output_file = os.path.join(output_dir, f"filtered_pipeline_{JOB_INDEX}.parquet")
+
+    start = time.time()
+    count = write_parquet(iter_pipeline(records, **kwargs), output_file)
+
+    print(f"[PIPELINE] {count} noticias filtradas en {time.time() - start:.2f}s")
+    return count
+
+
+# ------------------ ENTRYPOINT ------------------
+
+if __name__ == "__main__":
+    print("[PIPELINE] Starting streaming pipeline")
+    print(f"[PIPELINE] Pod index {JOB_INDEX} of {JOB_TOTAL}")
+
+    assigned_domains = split_work(
+        COLOMBIAN_DOMAINS,
+        JOB_INDEX,
+        JOB_TOTAL,
+    )
+
+    records = collect_records(
+        domains=assigned_domains,
+        from_year=FROM_YEAR,
+        to_year=TO_YEAR,
+        max_records=MAX_RECORDS,
+    )
+
+    print(f"[PIPELINE] Total records found: {len(records)}")
+
+    run_pipeline(
+        records,
+        output_dir="data/filtered",
+        parse_workers=os.cpu_count()
+    )
+
+    print("[PIPELINE] Pipeline completed")
@@ -1,13 +1,32 @@
 import os
-import json
+import orjson
 import time
+import shutil
+import asyncio
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from app.config.colombian_domains import COLOMBIAN_DOMAINS
 
 CC_BASE = "https://data.commoncrawl.org/"
 
+# Sesión compartida: keep-alive y pool de conexiones entre todas las descargas.
+# Los 429/5xx del índice son frecuentes: reintentos con backoff en el adapter.
+RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET"]),
+)
+ADAPTER = HTTPAdapter(pool_connections=20, pool_maxsize=50, max_retries=RETRY)
+
+SESSION = requests.Session()
+SESSION.mount("https://", ADAPTER)
+SESSION.mount("http://", ADAPTER)
+
 # Índices disponibles (ejemplo)
 AVAILABLE_INDICES = {
     2023: [
@@ -35,6 +54,10 @@ FROM_YEAR = int(os.environ.get("FROM_YEAR", 2024))
 TO_YEAR = int(os.environ.get("TO_YEAR", 2025))
 MAX_RECORDS = int(os.environ.get("MAX_RECORDS", 50))
 
+# Los índices de CommonCrawl son inmutables: sus resultados se guardan en el PVC
+INDEX_CACHE_DIR = os.environ.get("INDEX_CACHE_DIR", "/app/data/cc_index")
+REFRESH_INDEX = os.environ.get("REFRESH_INDEX", "0") == "1"
+
 
 
 def split_work(items, index, total):
@@ -46,43 +69,92 @@ def split_work(items, index, total):
 
 # ------------------ COMMONCRAWL ------------------
 
+def cc_indices(from_year, to_year):
+    return [
+        index
+        for year in range(from_year, to_year + 1)
+        for index in AVAILABLE_INDICES.get(year, [])
+    ]
+
+
+def index_cache_path(domain, index, max_records):
+    safe_domain = domain.replace("/", "_")
+    return os.path.join(INDEX_CACHE_DIR, index, f"{safe_domain}_{max_records}.jsonl")
+
+
+def read_index_cache(path):
+    try:
+        with open(path, "rb") as f:
+            return [orjson.loads(line) for line in f if line.strip()]
+    except OSError:
+        return None
+
+
+def write_index_cache(path, results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Escritura atómica: otro pod puede estar leyendo la misma entrada
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        for record in results:
+            f.write(orjson.dumps(record))
+            f.write(b"\n")
+    os.replace(tmp_path, path)
+
+
+def search_cc_index_one(domain, index, max_records=50):
+    cache_path = index_cache_path(domain, index, max_records)
+    if not REFRESH_INDEX:
+        cached = read_index_cache(cache_path)
+        if cached is not None:
+            print(f"[CACHE] {domain} → {index}")
+            return cached
+
+    results = []
+
+    cc_index_url = f"https://index.commoncrawl.org/{index}"
+    params = {
+        "url": f"{domain}/",
+        "matchType": "prefix",
+        "output": "json",
+    }
+
+    print(f"[INFO] {domain} → {index}")
+
+    try:
+        with SESSION.get(
+            cc_index_url, params=params, stream=True, timeout=30
+        ) as response:
+            if response.status_code != 200:
+                print(f"[WARN] {index} → {response.status_code}")
+                return results
+
+            # Bytes directo a orjson; al llegar al tope se cierra el stream
+            for line in response.iter_lines(chunk_size=65536, decode_unicode=False):
+                if not line:
+                    continue
+                results.append(orjson.loads(line))
+                if len(results) >= max_records:
+                    break
+
+        write_index_cache(cache_path, results)
+
+    except Exception as e:
+        print(f"[ERROR] {index}: {e}")
+
+    return results
+
+
 def search_cc_index(domain, from_year, to_year, max_records=50):
     results = []
 
-    for year in range(from_year, to_year + 1):
-        indices = AVAILABLE_INDICES.get(year, [])
-        for index in indices:
-            cc_index_url = f"https://index.commoncrawl.org/{index}"
-            params = {
-                "url": f"{domain}/",
-                "matchType": "prefix",
-                "output": "json",
-            }
-
-            print(f"[INFO] {domain} → {index}")
-
-            try:
-                with requests.get(
-                    cc_index_url, params=params, stream=True, timeout=30
-                ) as response:
-                    if response.status_code != 200:
-                        print(f"[WARN] {index} → {response.status_code}")
-                        continue
-
-                    for i, line in enumerate(response.iter_lines()):
-                        if not line:
-                            continue
-                        results.append(json.loads(line))
-                        if i + 1 >= max_records:
-                            break
-
-            except Exception as e:
-                print(f"[ERROR] {index}: {e}")
+    for index in cc_indices(from_year, to_year):
+        results.extend(search_cc_index_one(domain, index, max_records))
 
     return results
 
 
-def download_cc_file(record, output_dir="/app/data/raw"):
+def warc_range_request(record, output_dir="/app/data/raw"):
     os.makedirs(output_dir, exist_ok=True)
 
     warc_url = CC_BASE + record["filename"]
@@ -94,56 +166,96 @@ def download_cc_file(record, output_dir="/app/data/raw"):
     safe_name = record["filename"].replace("/", "_")
     output_path = os.path.join(output_dir, f"{safe_name}_{offset}.warc.gz")
 
-    with requests.get(
+    return warc_url, headers, output_path
+
+
+def download_cc_file(record, output_dir="/app/data/raw"):
+    warc_url, headers, output_path = warc_range_request(record, output_dir)
+
+    with SESSION.get(
         warc_url, headers=headers, stream=True, timeout=(10, 120)
     ) as response:
         response.raise_for_status()
+        # Copia en C desde el socket al archivo, sin pasar cada chunk por Python
+        response.raw.decode_content = True
         with open(output_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    f.write(chunk)
+            shutil.copyfileobj(response.raw, f, 1024 * 1024)
+
+    return output_path
+
+
+async def download_cc_file_async(session, record, sem, output_dir="/app/data/raw"):
+    warc_url, headers, output_path = warc_range_request(record, output_dir)
+
+    async with sem, session.get(warc_url, headers=headers) as response:
+        response.raise_for_status()
+        with open(output_path, "wb") as f:
+            async for chunk in response.content.iter_chunked(1024 * 1024):
+                f.write(chunk)
 
     return output_path
 
 
 # ------------------ PIPELINE ------------------
 
-def collect_records(domains, from_year, to_year, max_records):
+def collect_records(domains, from_year, to_year, max_records, max_workers=20):
     all_records = []
     start = time.time()
+    indices = cc_indices(from_year, to_year)
 
-    for domain in domains:
-        print(f"[SEARCH] {domain}")
-        records = search_cc_index(domain, from_year, to_year, max_records)
-        print(f"[FOUND] {domain}: {len(records)}")
-        all_records.extend(records)
+    # Consultas al índice: IO puro, un hilo por par (dominio, índice)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for domain in domains:
+            print(f"[SEARCH] {domain}")
+            for index in indices:
+                futures[executor.submit(
+                    search_cc_index_one, domain, index, max_records
+                )] = (domain, index)
+
+        for future in as_completed(futures):
+            domain, index = futures[future]
+            records = future.result()
+            print(f"[FOUND] {domain} → {index}: {len(records)}")
+            all_records.extend(records)
 
     print(f"[DONE] Search in {time.time() - start:.2f}s")
     return all_records
 
 
-def download_records(records, max_workers=5):
+async def download_records_async(records, max_concurrency=32):
     downloaded = []
     total = len(records)
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {
-            executor.submit(download_cc_file, record): record
-            for record in records
-        }
-
-        for i, future in enumerate(as_completed(futures), 1):
-            record = futures[future]
-            try:
-                path = future.result()
+    # Descargas por rango: IO puro, un solo event loop en vez de hilos
+    sem = asyncio.Semaphore(max_concurrency)
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+    timeout = aiohttp.ClientTimeout(sock_connect=10, sock_read=120)
+
+    async def fetch(record):
+        try:
+            return record, await download_cc_file_async(session, record, sem), None
+        except Exception as e:
+            return record, None, e
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        tasks = [fetch(record) for record in records]
+
+        for i, task in enumerate(asyncio.as_completed(tasks), 1):
+            record, path, error = await task
+            if error is None:
                 downloaded.append(path)
                 print(f"[{i}/{total}] OK {record['url']}")
-            except Exception as e:
-                print(f"[{i}/{total}] FAIL {record['url']} → {e}")
+            else:
+                print(f"[{i}/{total}] FAIL {record['url']} → {error}")
 
     return downloaded
 
 
+def download_records(records, max_workers=32):
+    return asyncio.run(download_records_async(records, max_concurrency=max_workers))
+
+
 # ------------------ ENTRYPOINT ------------------
 
 if __name__ == "__main__":
@@ -169,7 +281,7 @@ if __name__ == "__main__":
 
     downloaded = download_records(
         records,
-        max_workers=5,
+        max_workers=32,
     )
 
     print(f"[SOURCES] Downloaded files: {len(downloaded)}")
@@ -8,21 +8,30 @@ def lagged_correlation(
     target_col: str,
     max_lag: int = 5
 ) -> pd.DataFrame:
+    x = df[sentiment_col].to_numpy(dtype=np.float64)
+    y = df[target_col].to_numpy(dtype=np.float64)
+    n = len(x)
+
+    # Desfase por slicing sobre arrays: sin shift/concat/dropna por lag
+    valid_x = ~np.isnan(x)
+    valid_y = ~np.isnan(y)
+
     results = []
 
-    for lag in range(0, max_lag + 1):
-        shifted = df[sentiment_col].shift(lag)
-        valid = pd.concat([shifted, df[target_col]], axis=1).dropna()
+    for lag in range(0, min(max_lag, n - 1) + 1):
+        mask = valid_x[:n - lag] & valid_y[lag:]
+        n_obs = int(mask.sum())
 
-        if len(valid) < 10:
+        if n_obs < 10:
             continue
 
-        corr = valid.iloc[:, 0].corr(valid.iloc[:, 1])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = np.corrcoef(x[:n - lag][mask], y[lag:][mask])[0, 1]
 
         results.append({
             "lag": lag,
-            "correlation": round(corr, 4),
-            "n_obs": len(valid)
+            "correlation": round(float(corr), 4),
+            "n_obs": n_obs
         })
 
     return pd.DataFrame(results)
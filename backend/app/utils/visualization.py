@@ -1,24 +1,29 @@
 import os
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import pandas as pd
 
+# API orientada a objetos: sin el estado global de pyplot ni backend interactivo
+
+# zlib nivel 1: mismo PNG sin pérdida, codificación mucho más barata
+PNG_KWARGS = {"compress_level": 1}
+
 
 def plot_lagged_correlation(
     df: pd.DataFrame,
     title: str,
     output_path: str
 ):
-    plt.figure(figsize=(8, 5))
-    plt.plot(df["lag"], df["correlation"], marker="o")
-    plt.axhline(0, linestyle="--")
-    plt.xlabel("Rezago (días)")
-    plt.ylabel("Correlación")
-    plt.title(title)
-    plt.grid(True)
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    ax.plot(df["lag"], df["correlation"], marker="o")
+    ax.axhline(0, linestyle="--")
+    ax.set_xlabel("Rezago (días)")
+    ax.set_ylabel("Correlación")
+    ax.set_title(title)
+    ax.grid(True)
 
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    plt.savefig(output_path, dpi=150)
-    plt.close()
+    fig.savefig(output_path, dpi=150, pil_kwargs=PNG_KWARGS)
 
 
 def plot_rolling_correlation(
@@ -34,17 +39,17 @@ def plot_rolling_correlation(
         .corr(df[target_col])
     )
 
-    plt.figure(figsize=(10, 5))
-    plt.plot(df["date"], rolling_corr)
-    plt.axhline(0, linestyle="--")
-    plt.xlabel("Fecha")
-    plt.ylabel("Correlación móvil")
-    plt.title(f"Rolling correlation ({window} días)")
-    plt.grid(True)
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
+    ax.plot(df["date"], rolling_corr)
+    ax.axhline(0, linestyle="--")
+    ax.set_xlabel("Fecha")
+    ax.set_ylabel("Correlación móvil")
+    ax.set_title(f"Rolling correlation ({window} días)")
+    ax.grid(True)
 
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    plt.savefig(output_path, dpi=150)
-    plt.close()
+    fig.savefig(output_path, dpi=150, pil_kwargs=PNG_KWARGS)
 
 def plot_sentiment_vs_market(
     df: pd.DataFrame,
@@ -53,7 +58,8 @@ def plot_sentiment_vs_market(
     title: str,
     output_path: str
 ):
-    fig, ax1 = plt.subplots(figsize=(12, 5))
+    fig = Figure(figsize=(12, 5))
+    ax1 = fig.subplots()
 
     # ICOLCAP (eje izquierdo)
     line1, = ax1.plot(
@@ -85,8 +91,7 @@ def plot_sentiment_vs_market(
     labels = [l.get_label() for l in lines]
     ax1.legend(lines, labels, loc="upper left")
 
-    plt.title(title)
+    ax2.set_title(title)
 
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    plt.savefig(output_path, dpi=150)
-    plt.close()
+    fig.savefig(output_path, dpi=150, pil_kwargs=PNG_KWARGS)